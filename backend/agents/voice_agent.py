@@ -1,37 +1,227 @@
 import os
-import sys
-from google.cloud import speech
+import struct
+import uuid
+import hashlib
+from collections import OrderedDict
+from google.cloud import speech, storage
+from google.cloud.speech_v1 import SpeechAsyncClient
+from google.api_core.exceptions import DeadlineExceeded, ResourceExhausted, ServiceUnavailable
+from tenacity import retry, retry_if_exception_type, stop_after_attempt, wait_random_exponential
+import aiofiles
 import asyncio
-from typing import Any, Dict
+from typing import Any, Dict, List, Optional, Tuple
 import logging
+from .base_agent import BaseAgent
+from core.sessionManager import SessionManager
 logger = logging.getLogger(__name__)
 
-# Handle imports - try relative first, then absolute
-try:
-    from .base_agent import BaseAgent
-    from ..core.sessionManager import SessionManager
-except ImportError:
-    # Add parent directories to path for absolute imports
-    current_dir = os.path.dirname(os.path.abspath(__file__))
-    backend_dir = os.path.dirname(current_dir)
-    project_dir = os.path.dirname(backend_dir)
+# Encodings and sample rates tried when the primary configuration errors out.
+# MP3 is left out, the v1 API's AudioEncoding has no MP3 member.
+# Opus only decodes at a handful of rates, so we skip the rest for those encodings.
+FALLBACK_ENCODINGS = [
+    (speech.RecognitionConfig.AudioEncoding.LINEAR16, "LINEAR16"),
+    (speech.RecognitionConfig.AudioEncoding.OGG_OPUS, "OGG_OPUS"),
+    (speech.RecognitionConfig.AudioEncoding.WEBM_OPUS, "WEBM_OPUS")
+]
+FALLBACK_SAMPLE_RATES = [48000, 44100, 16000, 8000]
+OPUS_SAMPLE_RATES = [48000, 16000]
+# Max fallback requests in flight at once, keeps us well under the STT quota
+FALLBACK_CONCURRENCY = 4
+
+# Bytes read up front to detect the container format
+AUDIO_HEADER_BYTES = 4096
+# Audio sent per streaming request, well below the 25KB per-message limit
+STREAM_CHUNK_SIZE = 16384
+
+# Synchronous recognize caps out at about a minute of audio, anything longer
+# goes through long_running_recognize from a GCS upload
+LONG_AUDIO_SECONDS = 55
+LONG_RUNNING_TIMEOUT_SECONDS = 600
+
+# Transcripts kept in memory, keyed by audio content hash
+TRANSCRIPT_CACHE_SIZE = 1024
+
+# Cap on STT calls in flight across every VoiceAgent in this worker. The app shares
+# one client, so calls multiplex over a single channel instead of bursting the quota.
+MAX_INFLIGHT_STT_REQUESTS = 32
+_stt_inflight = asyncio.Semaphore(MAX_INFLIGHT_STT_REQUESTS)
+
+# Transient STT failures worth retrying with backoff
+RETRYABLE_STT_ERRORS = (ServiceUnavailable, DeadlineExceeded, ResourceExhausted)
+STT_MAX_ATTEMPTS = 5
+STT_MAX_RETRY_WAIT_SECONDS = 8
+_stt_backoff = wait_random_exponential(multiplier=0.25, max=STT_MAX_RETRY_WAIT_SECONDS)
+
+
+def _retry_after_seconds(error: BaseException) -> Optional[float]:
+    """Read the retry-after hint from the gRPC trailing metadata, if the server sent one."""
+    call = getattr(error, "response", None)
+    trailing_metadata = getattr(call, "trailing_metadata", None)
+    if not callable(trailing_metadata):
+        return None
+    try:
+        for key, value in trailing_metadata() or ():
+            if key.lower() == "retry-after":
+                return float(value)
+    except (TypeError, ValueError):
+        pass
+    return None
+
+
+def _wait_stt_retry(retry_state) -> float:
+    """Honor the server's retry-after hint (capped), otherwise back off exponentially with jitter."""
+    retry_after = _retry_after_seconds(retry_state.outcome.exception())
+    if retry_after is not None:
+        return min(retry_after, STT_MAX_RETRY_WAIT_SECONDS)
+    return _stt_backoff(retry_state)
+
+# EBML element IDs needed to read the audio track settings of a WebM file
+_EBML_MAGIC = b"\x1a\x45\xdf\xa3"
+_EBML_CLUSTER = b"\x1f\x43\xb6\x75"
+_EBML_SAMPLING_FREQUENCY = b"\xb5"
+_EBML_CHANNELS = b"\x9f"
+_EBML_DURATION = b"\x44\x89"
+_EBML_TIMECODE_SCALE = b"\x2a\xd7\xb1"
+
+# Upload MIME types to fall back on when the header isn't recognized
+_CONTENT_TYPE_ENCODINGS = {
+    "audio/webm": speech.RecognitionConfig.AudioEncoding.WEBM_OPUS,
+    "audio/ogg": speech.RecognitionConfig.AudioEncoding.OGG_OPUS,
+    "audio/wav": speech.RecognitionConfig.AudioEncoding.LINEAR16,
+    "audio/x-wav": speech.RecognitionConfig.AudioEncoding.LINEAR16
+}
+
+_EXTENSION_CONTENT_TYPES = {
+    "webm": "audio/webm",
+    "ogg": "audio/ogg",
+    "wav": "audio/wav"
+}
+
+
+def _sniff_audio(content: bytes) -> Tuple[Any, Optional[int], Optional[int]]:
+    """
+    Detect the audio encoding from the container's magic bytes.
     
-    if backend_dir not in sys.path:
-        sys.path.insert(0, backend_dir)
+    Args:
+        content: Raw audio file bytes.
+        
+    Returns:
+        Tuple of (encoding, sample_rate, channels). Any of them is None when
+        it cannot be read from the header.
+    """
+    AudioEncoding = speech.RecognitionConfig.AudioEncoding
+
+    if content[:4] == _EBML_MAGIC:
+        sample_rate, channels = _parse_webm_header(content)
+        return AudioEncoding.WEBM_OPUS, _opus_rate(sample_rate), channels
+
+    if content[:4] == b"OggS":
+        # First page holds the OpusHead packet right after the 27 byte page header
+        # and its single-entry segment table
+        head = content[28:47]
+        if head[:8] == b"OpusHead" and len(head) >= 16:
+            channels = head[9]
+            sample_rate = struct.unpack("<I", head[12:16])[0]
+            return AudioEncoding.OGG_OPUS, _opus_rate(sample_rate), channels
+        return AudioEncoding.OGG_OPUS, 48000, None
+
+    if content[:4] == b"RIFF" and content[8:12] == b"WAVE" and len(content) >= 28:
+        channels = struct.unpack("<H", content[22:24])[0]
+        sample_rate = struct.unpack("<I", content[24:28])[0]
+        return AudioEncoding.LINEAR16, sample_rate, channels
+
+    return None, None, None
+
+
+def _opus_rate(sample_rate: Optional[int]) -> int:
+    """Opus always decodes at one of a few fixed rates; anything else decodes at 48kHz."""
+    return sample_rate if sample_rate in (8000, 12000, 16000, 24000, 48000) else 48000
+
+
+def _webm_track_header(content: bytes) -> bytes:
+    """Slice off everything from the first cluster, the segment info and tracks come before it."""
+    cluster_at = content.find(_EBML_CLUSTER)
+    return content[:cluster_at] if cluster_at != -1 else content[:AUDIO_HEADER_BYTES]
+
+
+def _read_ebml_float(header: bytes, element_id: bytes) -> Optional[float]:
+    """Find a 4 or 8 byte EBML float element and decode it."""
+    pos = header.find(element_id)
+    while pos != -1:
+        data_at = pos + len(element_id) + 1
+        size = header[data_at - 1] if data_at <= len(header) else 0
+        if size == 0x84 and data_at + 4 <= len(header):
+            return struct.unpack(">f", header[data_at:data_at + 4])[0]
+        if size == 0x88 and data_at + 8 <= len(header):
+            return struct.unpack(">d", header[data_at:data_at + 8])[0]
+        pos = header.find(element_id, pos + 1)
+    return None
+
+
+def _read_ebml_uint(header: bytes, element_id: bytes) -> Optional[int]:
+    """Find an EBML unsigned integer element with a one byte size and decode it."""
+    pos = header.find(element_id)
+    while pos != -1:
+        data_at = pos + len(element_id) + 1
+        size = header[data_at - 1] if data_at <= len(header) else 0
+        length = size & 0x7F
+        if 0x81 <= size <= 0x88 and data_at + length <= len(header):
+            return int.from_bytes(header[data_at:data_at + length], "big")
+        pos = header.find(element_id, pos + 1)
+    return None
+
+
+def _parse_webm_header(content: bytes) -> Tuple[Optional[int], Optional[int]]:
+    """Read SamplingFrequency and Channels from the WebM track header."""
+    header = _webm_track_header(content)
+    sample_rate = _read_ebml_float(header, _EBML_SAMPLING_FREQUENCY)
+    channels = _read_ebml_uint(header, _EBML_CHANNELS)
+    return (int(sample_rate) if sample_rate else None), channels
+
+
+def _probe_duration(content: bytes) -> Optional[float]:
+    """
+    Estimate the clip length in seconds from the container header.
     
-    try:
-        from agents.base_agent import BaseAgent
-        from core.sessionManager import SessionManager
-    except ImportError:
-        # Fallback: try importing from current directory
-        from base_agent import BaseAgent
-        from sessionManager import SessionManager
+    Args:
+        content: Leading bytes of the audio file.
+        
+    Returns:
+        Duration in seconds, or None when the header does not record it
+        (browser MediaRecorder WebM output usually leaves it out).
+    """
+    if content[:4] == _EBML_MAGIC:
+        header = _webm_track_header(content)
+        duration = _read_ebml_float(header, _EBML_DURATION)
+        if duration is None:
+            return None
+        timecode_scale = _read_ebml_uint(header, _EBML_TIMECODE_SCALE) or 1_000_000
+        return duration * timecode_scale / 1e9
+
+    if content[:4] == b"RIFF" and content[8:12] == b"WAVE" and len(content) >= 32:
+        byte_rate = struct.unpack("<I", content[28:32])[0]
+        pos = 12
+        while pos + 8 <= len(content):
+            chunk_id = content[pos:pos + 4]
+            size = struct.unpack("<I", content[pos + 4:pos + 8])[0]
+            if chunk_id == b"data":
+                return size / byte_rate if byte_rate else None
+            # RIFF chunks are padded to an even length
+            pos += 8 + size + (size & 1)
+
+    return None
+
 
 class VoiceAgent(BaseAgent):
-    def __init__(self, session_manager: SessionManager):
+    def __init__(self, session_manager: SessionManager, stt_client: SpeechAsyncClient):
         super().__init__(name="VoiceAgent")
         self.session_manager = session_manager
-        self.stt_client = speech.SpeechClient()
+        # Recent transcripts keyed by audio content hash
+        self._transcript_cache: OrderedDict = OrderedDict()
+        self.stt_client = stt_client
+        # Bucket used to stage long recordings for long_running_recognize
+        self.gcs_bucket = os.getenv("STT_GCS_BUCKET")
+        self._storage_client = None
         #self.tts_client = texttospeech.TextToSpeechClient()
 
     async def process(self, input_data: Dict[str, Any]) -> Dict[str, Any]:
@@ -39,7 +229,8 @@ class VoiceAgent(BaseAgent):
         Process input data for speech-to-text or text-to-speech.
         
         Args:
-            input_data: Dictionary containing 'action' and 'audio_file_path' or 'text'.
+            input_data: Dictionary containing 'action' and 'audio_bytes' (with an optional
+                'content_type'), 'audio_file_path' or 'text'.
             
         Returns:
             Dictionary with processed results.
@@ -50,22 +241,30 @@ class VoiceAgent(BaseAgent):
             mode = input_data.get("action")
             
             if mode == "transcribe":
+                audio_bytes = input_data.get("audio_bytes")
+                if audio_bytes:
+                    logger.info(f"Processing {len(audio_bytes)} bytes of uploaded audio")
+                    transcript = await self.speech_to_text_bytes(audio_bytes, input_data.get("content_type"))
+                    voice_output["transcript"] = transcript
+                    logger.info(f"Transcribing voice done: '{transcript[:50]}...'")
+                    return self._create_response(voice_output)
+
                 audio_file_path = input_data.get("audio_file_path") or input_data.get("audio_data")
                 if not audio_file_path:
                     return self._create_response({"error": "Missing audio file path"}, status="error")
                 
                 logger.info(f"Processing audio file: {audio_file_path}")
                 
-                # Check if file exists
-                if not os.path.exists(audio_file_path):
+                # One stat call both checks the file exists and gives its size for logging
+                try:
+                    file_stat = os.stat(audio_file_path)
+                except FileNotFoundError:
                     logger.error(f"Audio file not found: {audio_file_path}")
                     return self._create_response({"error": f"Audio file not found: {audio_file_path}"}, status="error")
                 
-                # Get file size for logging
-                file_size = os.path.getsize(audio_file_path)
-                logger.info(f"Audio file size: {file_size} bytes")
+                logger.info(f"Audio file size: {file_stat.st_size} bytes")
                 
-                transcript = self.speech_to_text(audio_file_path)
+                transcript = await self.speech_to_text(audio_file_path)
                 voice_output["transcript"] = transcript
                 logger.info(f"Transcribing voice done: '{transcript[:50]}...'")
                 return self._create_response(voice_output)
@@ -84,7 +283,7 @@ class VoiceAgent(BaseAgent):
             self.logger.error(f"Error processing input: {e}")
             return self._handle_error(e)
 
-    def speech_to_text(self, audio_file_path: str) -> str:
+    async def speech_to_text(self, audio_file_path: str) -> str:
         """
         Convert speech audio file to text using Google Cloud Speech-to-Text.
         
@@ -96,114 +295,267 @@ class VoiceAgent(BaseAgent):
         """
         logger.info(f"Starting speech to text conversion for file: {audio_file_path}")
         
-        # Check file extension to determine format
-        file_ext = os.path.splitext(audio_file_path)[1].lower()
+        # The extension is only a hint for when the header isn't recognized
+        file_ext = audio_file_path.rpartition('.')[2].lower()
         logger.info(f"File extension: {file_ext}")
         
-        with open(audio_file_path, "rb") as audio_file:
-            content = audio_file.read()
+        async with aiofiles.open(audio_file_path, "rb") as audio_file:
+            content = await audio_file.read()
             logger.info(f"Read {len(content)} bytes from audio file")
 
-        audio = speech.RecognitionAudio(content=content)
+        return await self.speech_to_text_bytes(content, _EXTENSION_CONTENT_TYPES.get(file_ext))
+
+    async def speech_to_text_bytes(self, content: bytes, content_type: Optional[str] = None) -> str:
+        """
+        Convert in-memory speech audio to text using Google Cloud Speech-to-Text.
         
-        # Configure based on file type
-        if file_ext == '.webm':
-            # WebM files typically use OGG_OPUS encoding
-            config = speech.RecognitionConfig(
-                encoding=speech.RecognitionConfig.AudioEncoding.OGG_OPUS,
-                sample_rate_hertz=48000,  # Common for WebM
-                language_code="en-US",
-                enable_automatic_punctuation=True,
-                use_enhanced=True,
-                model='latest_long',
-                audio_channel_count=1  # Mono audio is common for recordings
-            )
-            logger.info("Using OGG_OPUS encoding for WebM file")
-        else:
-            # Default configuration for other formats
-            config = speech.RecognitionConfig(
-                encoding=speech.RecognitionConfig.AudioEncoding.LINEAR16,
-                language_code="en-US",
-                enable_automatic_punctuation=True,
-                use_enhanced=True,
-                model='latest_long'
-            )
-            logger.info(f"Using LINEAR16 encoding for {file_ext} file")
+        Args:
+            content: Raw audio bytes, e.g. straight from the upload.
+            content_type: Optional MIME type of the upload, used when the
+                container can't be recognized from its header.
+            
+        Returns:
+            Transcribed text from the audio.
+        """
+        # Configure from the container header rather than the file extension,
+        # browsers happily upload Ogg or WAV data under a .webm name
+        header = content[:AUDIO_HEADER_BYTES]
+        encoding, sample_rate, channels = _sniff_audio(header)
+        if encoding is None:
+            mime_type = (content_type or "").partition(";")[0].strip().lower()
+            encoding = _CONTENT_TYPE_ENCODINGS.get(mime_type, speech.RecognitionConfig.AudioEncoding.LINEAR16)
+        config = self._build_config(encoding, sample_rate, channels)
+        logger.info(f"Detected audio format: {encoding.name}, rate {sample_rate}, channels {channels}")
+
+        # Identical audio always gets the same transcript, skip the RPC for repeats
+        content_hash = hashlib.blake2b(content, digest_size=16).hexdigest()
+        cache_key = f"stt_{content_hash}_{encoding.name}_{sample_rate}"
+        cached_transcript = self._get_cached_transcript(cache_key)
+        if cached_transcript:
+            logger.info(f"Using cached transcript: '{cached_transcript[:50]}...'")
+            return cached_transcript
+
+        duration = _probe_duration(header)
+        if duration is not None:
+            logger.info(f"Audio duration: {duration:.1f}s")
 
         try:
-            logger.info("Sending request to Google Speech-to-Text API...")
-            response = self.stt_client.recognize(config=config, audio=audio)
-            
-            logger.info(f"Received response with {len(response.results)} results")
+            if duration is not None and duration > LONG_AUDIO_SECONDS and self.gcs_bucket:
+                logger.info("Sending long audio to Google Speech-to-Text long running recognition...")
+                transcript = await self._long_running_recognize(content, config, content_type)
+            else:
+                if duration is not None and duration > LONG_AUDIO_SECONDS:
+                    logger.warning("Long audio but STT_GCS_BUCKET is not set, streaming it instead")
+                logger.info("Streaming audio to Google Speech-to-Text API...")
+                transcript = await self._stream_recognize(content, config)
             
-            # Combine results into a single transcript
-            if response.results:
-                transcript = " ".join(result.alternatives[0].transcript for result in response.results)
+            if transcript:
                 logger.info(f"Transcription successful: '{transcript[:50]}...'")
+                self._cache_transcript(cache_key, transcript)
                 return transcript
             else:
                 logger.warning("No results returned from Speech-to-Text API")
-                
-                # Try alternative encodings if no results
-                logger.info("Trying alternative encoding: WEBM_OPUS")
-                config = speech.RecognitionConfig(
-                    encoding=speech.RecognitionConfig.AudioEncoding.WEBM_OPUS,
-                    sample_rate_hertz=48000,
-                    language_code="en-US",
-                    enable_automatic_punctuation=True,
-                    use_enhanced=True,
-                    model='latest_long'
-                )
-                
-                response = self.stt_client.recognize(config=config, audio=audio)
-                if response.results:
-                    transcript = " ".join(result.alternatives[0].transcript for result in response.results)
-                    logger.info(f"WEBM_OPUS encoding successful: '{transcript[:50]}...'")
-                    return transcript
-                else:
-                    logger.warning("No results with WEBM_OPUS encoding either")
-                    return "No speech detected in audio file"
+                return "No speech detected in audio file"
             
+        except RETRYABLE_STT_ERRORS as e:
+            # Transient service errors that outlived the retries; other configs won't help
+            logger.error(f"Speech-to-Text unavailable after retries: {str(e)}")
+            return "Could not transcribe audio. Speech recognition failed."
+
         except Exception as e:
             logger.error(f"Error in speech_to_text: {str(e)}")
-            
-            # Try with common sample rates and different encodings
-            encodings = [
-                (speech.RecognitionConfig.AudioEncoding.LINEAR16, "LINEAR16"),
-                (speech.RecognitionConfig.AudioEncoding.OGG_OPUS, "OGG_OPUS"),
-                (speech.RecognitionConfig.AudioEncoding.WEBM_OPUS, "WEBM_OPUS"),
-                (speech.RecognitionConfig.AudioEncoding.MP3, "MP3")
-            ]
-            
-            common_rates = [48000, 44100, 16000, 8000]
+
+            # The fallback sends the audio inline with recognize, which rejects clips over a minute
+            if duration is not None and duration > LONG_AUDIO_SECONDS:
+                logger.error("Audio too long for fallback configurations, giving up")
+                return "Could not transcribe audio. Speech recognition failed."
             
             logger.info("Trying fallback configurations...")
-            
-            for encoding, encoding_name in encodings:
-                for rate in common_rates:
-                    try:
-                        logger.info(f"Trying with encoding {encoding_name}, rate {rate}")
-                        config = speech.RecognitionConfig(
-                            encoding=encoding,
-                            sample_rate_hertz=rate,
-                            language_code="en-US",
-                            enable_automatic_punctuation=True,
-                            use_enhanced=True,
-                            model='latest_long'
-                        )
-                        response = self.stt_client.recognize(config=config, audio=audio)
-                        
-                        if response.results:
-                            transcript = " ".join(result.alternatives[0].transcript for result in response.results)
-                            logger.info(f"Fallback successful with {encoding_name}, {rate}: '{transcript[:50]}...'")
-                            return transcript
-                    except Exception as inner_e:
-                        logger.debug(f"Fallback failed with {encoding_name}, {rate}: {str(inner_e)}")
-                        continue
+            audio = speech.RecognitionAudio(content=content)
+            transcript = await self._fallback_transcribe(audio)
+            if transcript:
+                self._cache_transcript(cache_key, transcript)
+                return transcript
             
             # If all attempts fail, log the detailed error and return a generic message
             logger.error(f"All transcription attempts failed. Original error: {str(e)}")
             return "Could not transcribe audio. Speech recognition failed."
+
+    def _get_cached_transcript(self, cache_key: str) -> Optional[str]:
+        """Look up a transcript in the in-memory LRU."""
+        transcript = self._transcript_cache.get(cache_key)
+        if transcript is not None:
+            self._transcript_cache.move_to_end(cache_key)
+        return transcript
+
+    def _cache_transcript(self, cache_key: str, transcript: str):
+        """Add a transcript to the in-memory LRU, evicting the oldest entry when full."""
+        self._transcript_cache[cache_key] = transcript
+        self._transcript_cache.move_to_end(cache_key)
+        if len(self._transcript_cache) > TRANSCRIPT_CACHE_SIZE:
+            self._transcript_cache.popitem(last=False)
+
+    @retry(
+        wait=_wait_stt_retry,
+        stop=stop_after_attempt(STT_MAX_ATTEMPTS),
+        retry=retry_if_exception_type(RETRYABLE_STT_ERRORS),
+        reraise=True
+    )
+    async def _do_recognize(self, config: speech.RecognitionConfig,
+                            audio: speech.RecognitionAudio) -> speech.RecognizeResponse:
+        """Send a single recognize request, retrying transient service errors."""
+        async with _stt_inflight:
+            return await self.stt_client.recognize(request={"config": config, "audio": audio})
+
+    @retry(
+        wait=_wait_stt_retry,
+        stop=stop_after_attempt(STT_MAX_ATTEMPTS),
+        retry=retry_if_exception_type(RETRYABLE_STT_ERRORS),
+        reraise=True
+    )
+    async def _stream_recognize(self, content: bytes, config: speech.RecognitionConfig) -> str:
+        """
+        Stream the audio to Speech-to-Text in small chunks.
+        
+        Upload and recognition overlap, so long clips aren't sent as one
+        oversized request.
+        
+        Args:
+            content: Raw audio bytes.
+            config: Recognition config for the audio.
+            
+        Returns:
+            The final transcript, empty if no speech was recognized.
+        """
+        streaming_config = speech.StreamingRecognitionConfig(config=config)
+        audio_view = memoryview(content)
+
+        async def _requests():
+            yield speech.StreamingRecognizeRequest(streaming_config=streaming_config)
+            for offset in range(0, len(audio_view), STREAM_CHUNK_SIZE):
+                yield speech.StreamingRecognizeRequest(audio_content=bytes(audio_view[offset:offset + STREAM_CHUNK_SIZE]))
+
+        transcripts = []
+        async with _stt_inflight:
+            responses = await self.stt_client.streaming_recognize(requests=_requests())
+            async for response in responses:
+                for result in response.results:
+                    if result.is_final and result.alternatives:
+                        transcripts.append(result.alternatives[0].transcript)
+        return " ".join(transcripts)
+
+    async def _long_running_recognize(self, content: bytes, config: speech.RecognitionConfig,
+                                      content_type: Optional[str] = None) -> str:
+        """
+        Transcribe a long recording by staging it in GCS for long_running_recognize.
+        
+        Args:
+            content: Raw audio bytes.
+            config: Recognition config for the audio.
+            content_type: Optional MIME type stored on the staged blob.
+            
+        Returns:
+            The combined transcript, empty if no speech was recognized.
+        """
+        if self._storage_client is None:
+            # Client construction looks up credentials, keep that off the event loop
+            self._storage_client = await asyncio.to_thread(storage.Client)
+
+        blob_name = f"stt/{uuid.uuid4()}"
+        blob = self._storage_client.bucket(self.gcs_bucket).blob(blob_name)
+        await asyncio.to_thread(blob.upload_from_string, content, content_type=content_type)
+        logger.info(f"Uploaded audio to gs://{self.gcs_bucket}/{blob_name}")
+
+        try:
+            audio = speech.RecognitionAudio(uri=f"gs://{self.gcs_bucket}/{blob_name}")
+            async with _stt_inflight:
+                operation = await self.stt_client.long_running_recognize(config=config, audio=audio)
+            response = await operation.result(timeout=LONG_RUNNING_TIMEOUT_SECONDS)
+            return " ".join(
+                result.alternatives[0].transcript for result in response.results if result.alternatives
+            )
+        finally:
+            try:
+                await asyncio.to_thread(blob.delete)
+            except Exception as e:
+                logger.warning(f"Failed to delete staged audio {blob_name}: {str(e)}")
+
+    def _build_config(self, encoding, sample_rate: Optional[int] = None,
+                      channels: Optional[int] = None) -> speech.RecognitionConfig:
+        """Build a recognition config, leaving out header fields we could not detect."""
+        config = speech.RecognitionConfig(
+            encoding=encoding,
+            language_code="en-US",
+            enable_automatic_punctuation=True,
+            use_enhanced=True,
+            model='latest_long'
+        )
+        if sample_rate:
+            config.sample_rate_hertz = sample_rate
+        if channels:
+            config.audio_channel_count = channels
+        return config
+
+    def _fallback_candidates(self) -> List[Tuple[Any, str, int]]:
+        """Build the (encoding, name, sample rate) combinations worth trying."""
+        opus_encodings = (
+            speech.RecognitionConfig.AudioEncoding.OGG_OPUS,
+            speech.RecognitionConfig.AudioEncoding.WEBM_OPUS
+        )
+        candidates = []
+        for encoding, encoding_name in FALLBACK_ENCODINGS:
+            rates = OPUS_SAMPLE_RATES if encoding in opus_encodings else FALLBACK_SAMPLE_RATES
+            for rate in rates:
+                candidates.append((encoding, encoding_name, rate))
+        return candidates
+
+    async def _fallback_transcribe(self, audio: speech.RecognitionAudio) -> Optional[str]:
+        """
+        Race the fallback configurations concurrently.
+        
+        Args:
+            audio: Audio payload to send with every candidate configuration.
+            
+        Returns:
+            The first non-empty transcript, or None if every configuration fails.
+        """
+        semaphore = asyncio.Semaphore(FALLBACK_CONCURRENCY)
+
+        async def _try(encoding, encoding_name: str, rate: int) -> Optional[str]:
+            config = speech.RecognitionConfig(
+                encoding=encoding,
+                sample_rate_hertz=rate,
+                language_code="en-US",
+                enable_automatic_punctuation=True,
+                use_enhanced=True,
+                model='latest_long'
+            )
+            async with semaphore:
+                logger.info(f"Trying with encoding {encoding_name}, rate {rate}")
+                try:
+                    response = await self._do_recognize(config, audio)
+                except Exception as inner_e:
+                    logger.debug(f"Fallback failed with {encoding_name}, {rate}: {str(inner_e)}")
+                    return None
+
+            if response.results:
+                transcript = " ".join(result.alternatives[0].transcript for result in response.results)
+                logger.info(f"Fallback successful with {encoding_name}, {rate}: '{transcript[:50]}...'")
+                return transcript
+            return None
+
+        tasks = [asyncio.create_task(_try(*candidate)) for candidate in self._fallback_candidates()]
+        try:
+            for next_done in asyncio.as_completed(tasks):
+                transcript = await next_done
+                if transcript:
+                    return transcript
+            return None
+        finally:
+            # Cancel whatever is still queued or in flight once we have a winner
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
     
 # async def main():
 #     # Initialize session manager
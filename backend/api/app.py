@@ -1,9 +1,25 @@
+from contextlib import asynccontextmanager
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
+from google.cloud.speech_v1 import SpeechAsyncClient
 from api.routes import voice_routes#, memory_routes
+from core.inputProcessor import InputProcessor
 from utils.config import settings
 from utils.logging_config import setup_logging
 
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Create the long-lived clients once per worker and close them on shutdown."""
+    # One STT client means one TLS handshake and auth token fetch per worker
+    app.state.stt = SpeechAsyncClient()
+    app.state.processor = InputProcessor(
+        session_timeout_minutes=settings.SESSION_TIMEOUT_MINUTES,
+        stt_client=app.state.stt
+    )
+    yield
+    await app.state.processor.cleanup()
+    await app.state.stt.transport.close()
+
 def create_app() -> FastAPI:
     """Create and configure FastAPI application."""
     
@@ -13,7 +29,8 @@ def create_app() -> FastAPI:
     # Create FastAPI app
     app = FastAPI(
         title=settings.API_TITLE,
-        version=settings.API_VERSION
+        version=settings.API_VERSION,
+        lifespan=lifespan
     )
     
     # Add CORS middleware
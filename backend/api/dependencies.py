@@ -1,4 +1,5 @@
 from functools import lru_cache
+from fastapi import Request
 from core.inputProcessor import InputProcessor
 from core.sessionManager import SessionManager
 from services.storage_service import StorageService
@@ -15,7 +16,6 @@ def get_storage_service() -> StorageService:
     """Get storage service instance."""
     return StorageService()
 
-@lru_cache()
-def get_input_processor() -> InputProcessor:
-    """Get input processor instance."""
-    return InputProcessor()
\ No newline at end of file
+def get_input_processor(request: Request) -> InputProcessor:
+    """Get the input processor created in the app lifespan."""
+    return request.app.state.processor
\ No newline at end of file
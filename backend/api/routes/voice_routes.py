@@ -1,19 +1,22 @@
-from fastapi import APIRouter, HTTPException, BackgroundTasks, File, UploadFile, Form
-from fastapi.responses import JSONResponse
+from fastapi import APIRouter, HTTPException, Depends, File, UploadFile, Form
+from fastapi.responses import ORJSONResponse
 from pydantic import BaseModel, Field
 from typing import Optional, Dict, Any
 from datetime import datetime
+import time
 import uuid
 import base64
 import json
 import os
+import aiofiles
 
 #from api.models import VoiceProcessRequest, VoiceProcessResponse
 from core.inputProcessor import InputProcessor
+from api.dependencies import get_input_processor
 from utils.logging_config import get_logger
 
 logger = get_logger(__name__)
-router = APIRouter(prefix="/api", tags=["voice"])
+router = APIRouter(prefix="/api", tags=["voice"], default_response_class=ORJSONResponse)
 
 # Request/Response Models
 class VoiceProcessRequest(BaseModel):
@@ -34,8 +37,7 @@ class VoiceProcessResponse(BaseModel):
 # Ensure uploads folder exists
 UPLOAD_FOLDER = "uploads"
 os.makedirs(UPLOAD_FOLDER, exist_ok=True)
-# Initialize processor (consider using dependency injection)
-processor = InputProcessor()
+UPLOAD_CHUNK_SIZE = 1 << 16
 
 @router.post("/process", response_model=VoiceProcessResponse)
 async def process_voice_input(
@@ -48,34 +50,34 @@ async def process_voice_input(
     # Audio file (optional - will be None if no audio sent)
     audio: Optional[UploadFile] = File(None, description="Audio file"),
     
-    background_tasks: BackgroundTasks = BackgroundTasks()
+    processor: InputProcessor = Depends(get_input_processor)
 ):
     """Main voice processing endpoint - now handles FormData."""
     request_id = str(uuid.uuid4())
-    start_time = datetime.now()
+    start_ns = time.perf_counter_ns()
 
     logger.info(f"Request {request_id}: Processing FormData from user {user_id}")
     try:
-        # Handle audio data
-        audio_data = None
+        # Handle audio data, passed straight through to transcription without a temp file
+        audio_bytes = None
+        content_type = None
         if audio is not None:
-            # Read the uploaded audio file
-            audio_content = await audio.read()
-
-            # Save to temp file if needed
-            temp_file_path = f"uploads/temp_audio_{request_id}.webm"
-            with open(temp_file_path, "wb") as f:
-                f.write(audio_content)
-
-            logger.info(f"Request {request_id}: Audio saved to {temp_file_path}")
-            audio_data = temp_file_path
+            audio_bytes = await audio.read() or None
+            content_type = audio.content_type
+        if audio_bytes:
+            logger.info(f"Request {request_id}: Received {len(audio_bytes)} bytes of {content_type} audio")
         else:
-            logger.info(f"Request {request_id}: No audio file provided")
+            logger.info(f"Request {request_id}: No audio provided")
+        
+        # The browser already transcribed it and there's no audio to improve on, so skip STT
+        skip_stt = not audio_bytes and bool(browser_transcript.strip())
         
         # Convert form data to your existing request_dict format
         request_dict = {
-            "text": "",
-            "audio_data": audio_data,  # Will be None if no audio
+            "text": browser_transcript if skip_stt else "",
+            "skip_stt": skip_stt,
+            "audio_bytes": audio_bytes,  # Will be None if no audio
+            "content_type": content_type,
             "browser_transcript": browser_transcript,
             "user_id": user_id,
             "timestamp": timestamp or datetime.now().isoformat(),
@@ -88,17 +90,13 @@ async def process_voice_input(
         # Process the input
         result = await processor.process_request(request_dict)
 
-        # Clean up temp file if it exists
-        if audio_data and os.path.exists(audio_data):
-            background_tasks.add_task(os.remove, audio_data)
-        
         # Get the transcribed text from the processed input
         transcribed_text = ""
         if result:
             # First check if there's an error
             if not result.get('success', True):
                 logger.error(f"Request {request_id}: Processing failed: {result.get('error')}")
-                return JSONResponse(
+                return ORJSONResponse(
                     status_code=500,
                     content={
                         "success": False,
@@ -122,12 +120,12 @@ async def process_voice_input(
             logger.info(f"Request {request_id}: No result from processor, using browser transcript")
         
         # Calculate total processing time
-        processing_time = int((datetime.now() - start_time).total_seconds() * 1000)
+        processing_time = (time.perf_counter_ns() - start_ns) // 1_000_000
         
         logger.info(f"Response with transcribed text: {transcribed_text[:50]}...")
 
         # Return the transcribed text to the client
-        return JSONResponse(
+        return ORJSONResponse(
             status_code=200, 
             content={
                 "success": True,
@@ -151,7 +149,7 @@ async def process_voice_input(
             success=False,
             error=str(e),
             request_id=request_id,
-            processing_time=(datetime.now() - start_time).total_seconds()
+            processing_time=(time.perf_counter_ns() - start_ns) / 1e9
         )
 
 
@@ -165,10 +163,11 @@ async def upload_audio(file: UploadFile = File(None)):
             filename = f"audio_{datetime.now().strftime('%Y%m%d_%H%M%S')}{os.path.splitext(file.filename)[1]}"
             filepath = os.path.join(UPLOAD_FOLDER, filename)
 
-            with open(filepath, "wb") as f:
-                f.write(await file.read())
+            async with aiofiles.open(filepath, "wb") as f:
+                while chunk := await file.read(UPLOAD_CHUNK_SIZE):
+                    await f.write(chunk)
 
-            return JSONResponse({"message": "File saved", "path": filepath})
+            return ORJSONResponse({"message": "File saved", "path": filepath})
 
         # Case 2: If base64 string is sent in JSON (raw body)
         # elif audioBase64:
@@ -182,10 +181,10 @@ async def upload_audio(file: UploadFile = File(None)):
         #     return JSONResponse({"message": "File saved", "path": filepath})
 
         else:
-            return JSONResponse({"error": "No audio found in request"}, status_code=400)
+            return ORJSONResponse({"error": "No audio found in request"}, status_code=400)
 
     except Exception as e:
-        return JSONResponse({"error": str(e)}, status_code=500)
+        return ORJSONResponse({"error": str(e)}, status_code=500)
 
 
 
@@ -18,7 +18,7 @@ class InputProcessor:
     Handles voice transcription, planning, and execution coordination.
     """
 
-    def __init__(self, session_timeout_minutes: int = 30):
+    def __init__(self, stt_client, session_timeout_minutes: int = 30):
 
         #initialize ai client
         os.environ["GOOGLE_API_KEY"]= os.getenv("GOOGLE_API_KEY")
@@ -30,7 +30,7 @@ class InputProcessor:
 
         # Initialize agents
         self.planner = PlannerAgent(self.session_manager, self.gemini_model)
-        self.voice_agent = VoiceAgent(self.session_manager)
+        self.voice_agent = VoiceAgent(self.session_manager, stt_client)
         self.executor = PlanExecutor(self.session_manager, self.storage_service)
 
         self.request_count = 0
@@ -47,7 +47,9 @@ class InputProcessor:
             request_data: Dictionary containing:
                 - text: Optional text input
                 - audio_data: Optional base64 audio
+                - audio_bytes: Optional raw audio bytes, with content_type
                 - audio_url: Optional audio file URL
+                - skip_stt: Optional flag to use text as-is without transcription
                 - user_id: User identifier
                 - timestamp: Optional timestamp
                 
@@ -67,7 +69,7 @@ class InputProcessor:
             initial_context = {
                 "user_id": user_id,
                 "created_from": "input_processor",
-                "initial_input_type": "audio" if request_data.get("audio_data") else "text"
+                "initial_input_type": "audio" if (request_data.get("audio_data") or request_data.get("audio_bytes")) else "text"
             }
             session_id = await self.session_manager.create_session(user_id, initial_context)
 
@@ -129,24 +131,37 @@ class InputProcessor:
         processed_data = request_data.copy()
         
         # Check if we have voice input that needs transcription
-        has_audio = bool(request_data.get("audio_data") or request_data.get("audio_url"))
+        has_audio = bool(request_data.get("audio_bytes") or request_data.get("audio_data") or request_data.get("audio_url"))
         has_text = bool(request_data.get("text", "").strip())
         browser_transcript = request_data.get("browser_transcript", "").strip()
+        skip_stt = request_data.get("skip_stt", False)
 
         # Determine if the memory is complete or not
         explicit_memory_complete = request_data.get('explicit_complete_memory', False)
         
-        if has_audio:
+        if skip_stt:
+            logger.info(f"Skipping transcription for request {request_id}, text already provided")
+
+        elif has_audio:
             logger.info(f"Transcribing voice input for request {request_id}")
             
             try:
                 # Use voice agent to transcribe audio
+                audio_bytes = request_data.get("audio_bytes")
                 audio_path = request_data.get("audio_data")
-                if audio_path and isinstance(audio_path, str):
-                    logger.info(f"Using audio file from path: {audio_path}")
+                if audio_bytes or (audio_path and isinstance(audio_path, str)):
+                    if audio_bytes:
+                        logger.info(f"Using {len(audio_bytes)} bytes of uploaded audio")
+                        voice_input = {
+                            "audio_bytes": audio_bytes,
+                            "content_type": request_data.get("content_type")
+                        }
+                    else:
+                        logger.info(f"Using audio file from path: {audio_path}")
+                        voice_input = {"audio_file_path": audio_path}
                     
                     transcription_result = await self.voice_agent.process({
-                        "audio_file_path": audio_path,
+                        **voice_input,
                         "action": "transcribe",
                         "request_id": request_id
                     })
@@ -189,6 +204,9 @@ class InputProcessor:
         if has_text and not has_audio:
             processed_data['text'] = request_data['text'].strip()
         
+        # Raw audio has been transcribed, don't carry it (or log it) through planning and execution
+        processed_data.pop("audio_bytes", None)
+
         # Add metadata
         processed_data["session_id"] = session_id
         processed_data["request_id"] = request_id
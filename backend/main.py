@@ -1,3 +1,4 @@
+import sys
 import uvicorn
 from api.app import create_app
 from utils.config import settings
@@ -14,5 +15,8 @@ if __name__ == "__main__":
         host=settings.HOST,
         port=settings.PORT,
         reload=settings.RELOAD,
-        log_level=settings.LOG_LEVEL.lower()
+        log_level=settings.LOG_LEVEL.lower(),
+        # uvloop and httptools are much faster for this I/O-bound service; uvloop has no Windows build
+        loop="asyncio" if sys.platform == "win32" else "uvloop",
+        http="httptools"
     )
\ No newline at end of file
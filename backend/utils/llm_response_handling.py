@@ -1,5 +1,74 @@
 import re
-import json
+import orjson
+
+# Compiled once, clean_llm_json runs on every LLM turn
+_FENCE_RE = re.compile(r'```(?:json|javascript)?\s*\n?(.*?)\n?```', re.DOTALL)
+
+
+_CLOSERS = {'{': '}', '[': ']'}
+
+
+def _iter_json_spans(text):
+    """
+    Yield candidate JSON objects and arrays in text from a single forward scan.
+    
+    A stack of expected closers is kept, so "]" never closes "{" and
+    braces inside string literals are ignored. Top-level spans are yielded
+    as soon as they balance. When an opener can never balance, because a
+    closer does not match or the text ends first, the complete spans
+    nested inside it are yielded instead. Spans nested in a candidate
+    follow it, for when the caller can't parse the outer one.
+    
+    Args:
+        text (str): Text that may contain a JSON object or array
+        
+    Yields:
+        str: Balanced spans, earliest opener first
+    """
+    # Each frame is (start index, expected closer, complete child spans)
+    stack = []
+    in_string = False
+    escape = False
+
+    for i, char in enumerate(text):
+        if in_string:
+            if escape:
+                escape = False
+            elif char == '\\':
+                escape = True
+            elif char == '"':
+                in_string = False
+        elif char == '"':
+            if stack:
+                in_string = True
+        elif char in _CLOSERS:
+            stack.append((i, _CLOSERS[char], []))
+        elif char in '}]' and stack:
+            start, closer, children = stack.pop()
+            if char == closer:
+                span = (start, i + 1, children)
+                if stack:
+                    stack[-1][2].append(span)
+                else:
+                    yield from _expand_spans(text, [span])
+            else:
+                # Nothing still open can balance past a mismatched closer
+                orphans = [child for frame in stack for child in frame[2]] + children
+                stack.clear()
+                yield from _expand_spans(text, orphans)
+
+    # Openers left at the end never closed, only what balanced inside them is usable
+    yield from _expand_spans(text, [child for frame in stack for child in frame[2]])
+
+
+def _expand_spans(text, spans):
+    """Yield each span followed by the spans nested inside it, in text order."""
+    pending = list(reversed(spans))
+    while pending:
+        start, end, children = pending.pop()
+        yield text[start:end]
+        pending.extend(reversed(children))
+
 
 def clean_llm_json(response):
     """
@@ -29,19 +98,21 @@ def clean_llm_json(response):
         text = str(response)
     
     # Remove markdown code blocks (handles both ```json and plain ```)
-    cleaned = re.sub(r'```(?:json|javascript)?\s*\n?(.*?)\n?```', r'\1', text, flags=re.DOTALL)
+    cleaned = _FENCE_RE.sub(r'\1', text)
     
     # Clean up whitespace
     cleaned = cleaned.strip()
     
     try:
-        return json.loads(cleaned)
-    except json.JSONDecodeError:
-        # If that fails, try to find JSON structure directly
-        json_match = re.search(r'(\{.*\}|\[.*\])', text, re.DOTALL)
-        if json_match:
+        return orjson.loads(cleaned)
+    except orjson.JSONDecodeError:
+        # If that fails, try each JSON structure in the fence-stripped text,
+        # skipping a span that is the whole string we just failed to parse
+        for json_span in _iter_json_spans(cleaned):
+            if json_span == cleaned:
+                continue
             try:
-                return json.loads(json_match.group(1))
-            except json.JSONDecodeError:
-                pass
+                return orjson.loads(json_span)
+            except orjson.JSONDecodeError:
+                continue
         return None
\ No newline at end of file
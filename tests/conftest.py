@@ -0,0 +1,5 @@
+import os
+import sys
+
+# The backend is run with backend/ as the import root (see backend/main.py)
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "backend"))
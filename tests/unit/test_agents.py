@@ -0,0 +1,118 @@
+import struct
+
+from google.cloud import speech
+
+from agents.voice_agent import _probe_duration, _read_ebml_float, _read_ebml_uint, _sniff_audio
+
+AudioEncoding = speech.RecognitionConfig.AudioEncoding
+
+
+def _wav_header(sample_rate=16000, channels=1, data_size=32000):
+    byte_rate = sample_rate * channels * 2
+    return (
+        b"RIFF" + struct.pack("<I", 36 + data_size) + b"WAVE"
+        + b"fmt " + struct.pack("<IHHIIHH", 16, 1, channels, sample_rate, byte_rate, channels * 2, 16)
+        + b"data" + struct.pack("<I", data_size)
+    )
+
+
+def _webm_info(duration=90_000.0, timecode_scale=1_000_000):
+    info = b"\x2a\xd7\xb1\x83" + timecode_scale.to_bytes(3, "big") + b"\x44\x89\x88" + struct.pack(">d", duration)
+    return b"\x1a\x45\xdf\xa3" + b"\x00" * 8 + info + b"\x1f\x43\xb6\x75"
+
+
+def _ogg_opus_header(sample_rate=48000, channels=1):
+    page_header = b"OggS" + b"\x00" * 22 + b"\x01" + b"\x13"
+    opus_head = b"OpusHead" + bytes([1, channels]) + struct.pack("<HIhB", 312, sample_rate, 0, 0)
+    return page_header + opus_head
+
+
+def _webm_header(sample_rate=48000.0, channels=1):
+    track_audio = b"\x9f\x81" + bytes([channels]) + b"\xb5\x88" + struct.pack(">d", sample_rate)
+    return b"\x1a\x45\xdf\xa3" + b"\x00" * 8 + b"\xe1" + bytes([0x80 | len(track_audio)]) + track_audio + b"\x1f\x43\xb6\x75"
+
+
+class TestSniffAudio:
+    def test_wav(self):
+        assert _sniff_audio(_wav_header(44100, 2)) == (AudioEncoding.LINEAR16, 44100, 2)
+
+    def test_ogg_opus(self):
+        assert _sniff_audio(_ogg_opus_header(16000, 2)) == (AudioEncoding.OGG_OPUS, 16000, 2)
+
+    def test_ogg_opus_unsupported_rate_decodes_at_48k(self):
+        assert _sniff_audio(_ogg_opus_header(44100)) == (AudioEncoding.OGG_OPUS, 48000, 1)
+
+    def test_webm(self):
+        assert _sniff_audio(_webm_header(48000.0, 1)) == (AudioEncoding.WEBM_OPUS, 48000, 1)
+
+    def test_webm_without_track_settings(self):
+        assert _sniff_audio(b"\x1a\x45\xdf\xa3" + b"\x00" * 16) == (AudioEncoding.WEBM_OPUS, 48000, None)
+
+    def test_truncated_ogg(self):
+        content = b"OggS" + b"\x00" * 24 + b"OpusHead\x01"
+        assert _sniff_audio(content) == (AudioEncoding.OGG_OPUS, 48000, None)
+
+    def test_truncated_wav(self):
+        assert _sniff_audio(b"RIFF\x00\x00\x00\x00WAVE") == (None, None, None)
+
+    def test_truncated_webm(self):
+        content = _webm_header()
+        assert _sniff_audio(content[:content.index(b"\xb5") + 4]) == (AudioEncoding.WEBM_OPUS, 48000, 1)
+
+
+class TestReadEbml:
+    def test_float_4_and_8_bytes(self):
+        assert _read_ebml_float(b"\xb5\x84" + struct.pack(">f", 16000.0), b"\xb5") == 16000.0
+        assert _read_ebml_float(b"\xb5\x88" + struct.pack(">d", 44100.0), b"\xb5") == 44100.0
+
+    def test_float_skips_false_match(self):
+        # an id byte inside other data is followed by an impossible size
+        header = b"\xb5\x01" + b"\xb5\x84" + struct.pack(">f", 8000.0)
+        assert _read_ebml_float(header, b"\xb5") == 8000.0
+
+    def test_float_truncated(self):
+        assert _read_ebml_float(b"\xb5\x88" + b"\x00" * 4, b"\xb5") is None
+        assert _read_ebml_float(b"\xb5", b"\xb5") is None
+
+    def test_uint(self):
+        assert _read_ebml_uint(b"\x9f\x81\x02", b"\x9f") == 2
+        assert _read_ebml_uint(b"\x2a\xd7\xb1\x83\x0f\x42\x40", b"\x2a\xd7\xb1") == 1_000_000
+
+    def test_uint_truncated(self):
+        assert _read_ebml_uint(b"\x9f\x82\x00", b"\x9f") is None
+        assert _read_ebml_uint(b"\x9f", b"\x9f") is None
+
+    def test_missing(self):
+        assert _read_ebml_float(b"\x00" * 16, b"\xb5") is None
+        assert _read_ebml_uint(b"\x00" * 16, b"\x9f") is None
+
+
+class TestProbeDuration:
+    def test_wav(self):
+        assert _probe_duration(_wav_header(16000, 1, data_size=32000 * 60)) == 60.0
+
+    def test_wav_skips_extra_chunks(self):
+        header = _wav_header(16000, 1, data_size=64000)
+        list_chunk = b"LIST" + struct.pack("<I", 3) + b"abc\x00"
+        data_at = header.index(b"data")
+        assert _probe_duration(header[:data_at] + list_chunk + header[data_at:]) == 2.0
+
+    def test_wav_truncated(self):
+        assert _probe_duration(_wav_header()[:30]) is None
+        assert _probe_duration(_wav_header()[:40]) is None
+
+    def test_webm(self):
+        assert _probe_duration(_webm_info(90_000.0)) == 90.0
+
+    def test_webm_custom_timecode_scale(self):
+        assert _probe_duration(_webm_info(900_000.0, timecode_scale=100_000)) == 90.0
+
+    def test_webm_without_duration(self):
+        assert _probe_duration(_webm_header()) is None
+
+    def test_webm_truncated(self):
+        content = _webm_info()
+        assert _probe_duration(content[:content.index(b"\x44\x89") + 6]) is None
+
+    def test_unknown_format(self):
+        assert _probe_duration(_ogg_opus_header()) is None
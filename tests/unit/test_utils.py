@@ -0,0 +1,47 @@
+from utils.llm_response_handling import _iter_json_spans, clean_llm_json
+
+
+class TestIterJsonSpans:
+    def test_nested_spans_follow_their_parent(self):
+        assert list(_iter_json_spans('x {"a": [1, {"b": 2}]} y')) == ['{"a": [1, {"b": 2}]}', '[1, {"b": 2}]', '{"b": 2}']
+
+    def test_braces_inside_strings(self):
+        assert list(_iter_json_spans('{"text": "a } b \\" ]"}')) == ['{"text": "a } b \\" ]"}']
+
+    def test_unclosed_opener_yields_inner_span(self):
+        assert list(_iter_json_spans('Items[: {"a":1}')) == ['{"a":1}']
+
+    def test_mismatched_closer(self):
+        assert list(_iter_json_spans('{"a": [1, 2} {"b": 3}')) == ['{"b": 3}']
+        assert list(_iter_json_spans('[{"a": 1}, {"b": 2]')) == ['{"a": 1}']
+
+    def test_no_json(self):
+        assert list(_iter_json_spans('no structure here } ]')) == []
+
+
+class TestCleanLlmJson:
+    def test_plain(self):
+        assert clean_llm_json('{"intent": "x"}') == {"intent": "x"}
+
+    def test_fenced(self):
+        assert clean_llm_json('Here you go:\n```json\n{"intent": "x"}\n```') == {"intent": "x"}
+
+    def test_prose_with_unclosed_bracket(self):
+        assert clean_llm_json('Items[: {"a":1}') == {"a": 1}
+        assert clean_llm_json('Note (see [1: {"intent": "x"}') == {"intent": "x"}
+
+    def test_multiple_blocks_returns_first(self):
+        assert clean_llm_json('First {"a": 1} then {"b": 2}') == {"a": 1}
+
+    def test_skips_span_that_does_not_parse(self):
+        assert clean_llm_json('Options {a, b} -> {"choice": "a"}') == {"choice": "a"}
+
+    def test_array(self):
+        assert clean_llm_json('Steps: [1, 2, 3].') == [1, 2, 3]
+
+    def test_unparseable(self):
+        assert clean_llm_json('{"a": [1, 2}') is None
+        assert clean_llm_json('') is None
+
+    def test_fenced_with_prose_inside_fence(self):
+        assert clean_llm_json('```json\nResult: {"a": 1}\n```') == {"a": 1}